@@ -1,14 +1,20 @@
-import os
 from pydantic_settings import BaseSettings
 from pydantic import Field, AnyHttpUrl, field_validator
-from typing import List, Literal, Union
-import json # For TARGET_LANGUAGES parsing
+from typing import List, Literal, Optional, Union
+import orjson # For TARGET_LANGUAGES parsing
+from functools import lru_cache
 
 class Settings(BaseSettings):
     # MongoDB
     mongo_uri: str = Field(..., validation_alias='MONGO_URI')
     mongo_db_name: str = Field("minbar_raw_data", validation_alias='MONGO_DB_NAME')
     raw_data_collection: str = Field("facebook_posts", validation_alias='RAW_DATA_COLLECTION')
+    mongo_max_pool_size: int = Field(20, validation_alias='MONGO_MAX_POOL_SIZE')
+    mongo_min_pool_size: int = Field(5, validation_alias='MONGO_MIN_POOL_SIZE')
+    mongo_insert_batch_size: int = Field(1000, gt=0, validation_alias='MONGO_INSERT_BATCH_SIZE')
+    # Write concern overrides for ingestion writes; unset means inherit the one from MONGO_URI
+    mongo_write_concern_w: Optional[Union[int, str]] = Field(None, validation_alias='MONGO_WRITE_CONCERN_W')
+    mongo_write_concern_journal: Optional[bool] = Field(None, validation_alias='MONGO_WRITE_CONCERN_JOURNAL')
 
     # Keyword Manager
     keyword_manager_url: AnyHttpUrl = Field(..., validation_alias='KEYWORD_MANAGER_URL')
@@ -28,10 +34,22 @@ class Settings(BaseSettings):
     keywords_per_cycle: int = Field(50, validation_alias='KEYWORDS_PER_CYCLE')
     target_languages: List[str] = Field(["ar", "fr", "en"], validation_alias='TARGET_LANGUAGES')
     keyword_reprocess_hours: int = Field(6, validation_alias='KEYWORD_REPROCESS_HOURS')
+    ingestion_concurrency: int = Field(16, gt=0, validation_alias='INGESTION_CONCURRENCY')
+    ingestion_write_batch_size: int = Field(500, gt=0, validation_alias='INGESTION_WRITE_BATCH_SIZE')
+    ingestion_write_flush_seconds: float = Field(2.0, validation_alias='INGESTION_WRITE_FLUSH_SECONDS')
 
     # Logging
     log_level: str = Field("INFO", validation_alias='LOG_LEVEL')
 
+    @field_validator("mongo_write_concern_w", mode='before')
+    @classmethod
+    def parse_write_concern_w(cls, v: Union[int, str, None]) -> Union[int, str, None]:
+        # Env values are strings; a node count like "2" must become an int, while
+        # "majority" or a tag set name stays a string
+        if isinstance(v, str) and v.strip().isdigit():
+            return int(v)
+        return v
+
     @field_validator("target_languages", mode='before')
     @classmethod
     def parse_target_languages(cls, v: Union[str, List[str]]) -> List[str]:
@@ -39,13 +57,13 @@ class Settings(BaseSettings):
             return v
         if isinstance(v, str):
             try:
-                parsed_list = json.loads(v)
+                parsed_list = orjson.loads(v)
                 if not isinstance(parsed_list, list):
                     raise ValueError("TARGET_LANGUAGES must be a JSON list of strings.")
                 if not all(isinstance(item, str) for item in parsed_list):
                     raise ValueError("All items in TARGET_LANGUAGES list must be strings.")
                 return parsed_list
-            except json.JSONDecodeError:
+            except orjson.JSONDecodeError:
                 raise ValueError("Invalid JSON string for TARGET_LANGUAGES.")
         raise ValueError("Invalid type for TARGET_LANGUAGES.")
 
@@ -54,4 +72,9 @@ class Settings(BaseSettings):
         env_file_encoding = 'utf-8'
         extra = 'ignore' # Ignore extra fields from environment
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Returns the process-wide Settings instance, building it on first use."""
+    return Settings()
+
+settings = get_settings()
@@ -1,39 +1,57 @@
 import logging
-from typing import List, Dict, Any
+import asyncio
+from typing import List
+from app.core.config import settings
 from app.db.database import get_raw_data_collection
 from app.models.data_models import RawFacebookPost
 from pymongo.errors import BulkWriteError
 
 logger = logging.getLogger(__name__)
 
+DUPLICATE_KEY_ERROR_CODE = 11000
+
 async def insert_raw_facebook_posts(posts: List[RawFacebookPost]):
     """
     Inserts a list of raw Facebook post data into the database.
 
     Args:
-        posts: A list of RawFacebookPost Pydantic models.
+        posts: A list of RawFacebookPost documents, ready for MongoDB.
     """
     collection = get_raw_data_collection()
     if not posts:
         logger.info("No posts provided to insert.")
         return
 
-    # Convert Pydantic models to dictionaries for MongoDB insertion
-    # Use exclude_unset=True if you want to avoid storing None values explicitly
-    documents = [post.model_dump(by_alias=True, exclude_unset=False) for post in posts]
+    logger.info(f"Attempting to insert {len(posts)} documents into '{collection.name}' collection.")
+    # Split into chunks so each insert_many call encodes a bounded batch and the
+    # event loop gets a chance to run other tasks between them.
+    batch_size = settings.mongo_insert_batch_size
+    chunks = [posts[i:i + batch_size] for i in range(0, len(posts), batch_size)]
+    # ordered=False allows inserts to continue even if some fail (e.g., duplicate key)
+    results = await asyncio.gather(
+        *[collection.insert_many(chunk, ordered=False) for chunk in chunks],
+        return_exceptions=True
+    )
 
-    logger.info(f"Attempting to insert {len(documents)} documents into '{collection.name}' collection.")
-    try:
-        # Use insert_many for better performance
-        # ordered=False allows inserts to continue even if some fail (e.g., duplicate key)
-        result = await collection.insert_many(documents, ordered=False)
-        logger.info(f"Successfully inserted {len(result.inserted_ids)} documents.")
-    except BulkWriteError as bwe:
-        # This can happen if ordered=False and there are duplicates (if an index exists)
-        # or other write errors. We log the details.
-        logger.warning(f"Bulk write error during insertion: {len(bwe.details.get('writeErrors', []))} errors.")
-        logger.debug(f"BulkWriteError details: {bwe.details}")
-        # Depending on requirements, you might want to handle specific errors differently
-    except Exception as e:
-        logger.error(f"An unexpected error occurred during database insertion: {e}")
-        # Depending on severity, you might want to raise this error# Functions to interact with the DB (insert raw data)
+    inserted_count = 0
+    for result in results:
+        if isinstance(result, BulkWriteError):
+            # This can happen if ordered=False and there are duplicates (if an index exists)
+            # or other write errors. We log the details.
+            inserted_count += result.details.get("nInserted", 0)
+            write_errors = result.details.get("writeErrors", [])
+            # Posts carry deterministic _ids, so duplicate key errors just mean they were already stored
+            duplicate_count = sum(1 for err in write_errors if err.get("code") == DUPLICATE_KEY_ERROR_CODE)
+            if duplicate_count:
+                logger.info(f"Skipped {duplicate_count} already stored documents.")
+            if len(write_errors) > duplicate_count:
+                logger.warning(f"Bulk write error during insertion: {len(write_errors) - duplicate_count} errors.")
+                logger.debug("BulkWriteError details: %s", result.details)
+            # Depending on requirements, you might want to handle specific errors differently
+        elif isinstance(result, Exception):
+            logger.error(f"An unexpected error occurred during database insertion: {result}")
+            # Depending on severity, you might want to raise this error
+        else:
+            inserted_count += len(result.inserted_ids)
+    logger.info(f"Successfully inserted {inserted_count} documents in {len(chunks)} batch(es).")
+# Functions to interact with the DB (insert raw data)
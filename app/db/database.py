@@ -1,5 +1,6 @@
 import logging
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
+from pymongo import WriteConcern, IndexModel, ASCENDING, DESCENDING
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -15,11 +16,35 @@ async def connect_db():
     """Establishes connection to MongoDB."""
     logger.info("Connecting to MongoDB...")
     try:
-        db.client = AsyncIOMotorClient(settings.mongo_uri)
+        db.client = AsyncIOMotorClient(
+            settings.mongo_uri,
+            maxPoolSize=settings.mongo_max_pool_size,
+            minPoolSize=settings.mongo_min_pool_size, # Keep warm connections for the first insert burst
+            maxIdleTimeMS=60000,
+            serverSelectionTimeoutMS=5000,
+            waitQueueTimeoutMS=10000,
+            compressors="zstd" # Wire compression pays off on the large original_post_data blobs
+        )
         db.db = db.client[settings.mongo_db_name]
-        db.raw_data_collection = db.db[settings.raw_data_collection]
+        # Ingestion writes keep the write concern from MONGO_URI unless overridden in settings
+        write_concern_overrides = {}
+        if settings.mongo_write_concern_w is not None:
+            write_concern_overrides["w"] = settings.mongo_write_concern_w
+        if settings.mongo_write_concern_journal is not None:
+            write_concern_overrides["j"] = settings.mongo_write_concern_journal
+        write_concern = None
+        if write_concern_overrides:
+            write_concern = WriteConcern(**{**db.db.write_concern.document, **write_concern_overrides})
+        db.raw_data_collection = db.db.get_collection(settings.raw_data_collection, write_concern=write_concern)
         # Ping the server to ensure connection
         await db.client.admin.command('ping')
+        # Indexes for keyword/concept/task lookups (_id is indexed implicitly).
+        # create_indexes is a no-op for indexes that already exist.
+        await db.raw_data_collection.create_indexes([
+            IndexModel([("retrieved_by_keyword", ASCENDING), ("ingestion_timestamp", DESCENDING)]),
+            IndexModel([("keyword_concept_id", ASCENDING)]),
+            IndexModel([("data365_task_id", ASCENDING)], sparse=True)
+        ])
         logger.info("Successfully connected to MongoDB.")
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
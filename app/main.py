@@ -8,6 +8,8 @@ from fastapi import FastAPI
 from app.core.config import settings
 from app.utils.logging_config import setup_logging
 from app.db.database import connect_db, close_db
+from app.services.data365_service import open_data365_client, close_data365_client
+from app.services.keyword_service import open_keyword_client, close_keyword_client
 from app.services.scheduler_service import start_scheduler, stop_scheduler
 # Import the function to be triggered
 from app.services.ingestion_service import run_ingestion_cycle
@@ -22,6 +24,8 @@ async def lifespan(app: FastAPI):
     logger.info("Application startup...")
     try:
         await connect_db()
+        await open_data365_client()
+        await open_keyword_client()
         # Scheduler starts but has no automatic ingestion job added
         await start_scheduler()
         logger.info("Startup complete.")
@@ -30,6 +34,8 @@ async def lifespan(app: FastAPI):
         # Shutdown actions
         logger.info("Application shutdown...")
         await stop_scheduler()
+        await close_keyword_client()
+        await close_data365_client()
         await close_db()
         logger.info("Shutdown complete.")
 
@@ -70,5 +76,8 @@ async def trigger_manual_ingestion():
 
 if __name__ == "__main__":
     import uvicorn
-    # Run on port 8001 by default if started directly
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8001, reload=True)
\ No newline at end of file
+    import sys
+    # Run on port 8001 by default if started directly. The app and the scheduler share
+    # uvicorn's event loop, so uvloop is selected here (it isn't available on Windows).
+    loop = "asyncio" if sys.platform == "win32" else "uvloop"
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8001, loop=loop, http="httptools", reload=False)
@@ -1,55 +1,120 @@
 # Logic for Data365 API interaction
 import logging
 import httpx
+import orjson
 import asyncio
+import random
 import urllib.parse
-from typing import Dict, Any, Optional, List, Tuple
+from functools import lru_cache
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# --- Private Helper ---
-async def _make_data365_request(
-    method: str,
-    endpoint: str,
-    params: Optional[Dict[str, Any]] = None,
-    json_data: Optional[Dict[str, Any]] = None
-) -> Dict[str, Any]:
-    """Helper function to make requests to the Data365 API."""
-    base_url = str(settings.data365_base_url).rstrip('/')
-    url = f"{base_url}{endpoint}"
-    headers = {"Accept": "application/json"}
+# Resolved once at import; these are used on every Data365 call.
+_DATA365_BASE_URL: str = str(settings.data365_base_url).rstrip('/')
+_DATA365_API_KEY: str = settings.data365_api_key
+_AUTH_PARAMS: Dict[str, str] = {"access_token": _DATA365_API_KEY}
+_HEADERS: Dict[str, str] = {"Accept": "application/json"}
+
+# Task status polling backs off from this base towards DATA365_POLL_INTERVAL_SECONDS
+_POLL_BACKOFF_BASE_SECONDS = 5.0
+_POLL_BACKOFF_FACTOR = 1.5
+_POLL_JITTER_SECONDS = 2.0
+_POLL_INITIAL_JITTER_SECONDS = 3.0
+
+# --- Shared HTTP Client ---
+# A single client is reused for all Data365 calls so connections (and TLS sessions)
+# are pooled across the initiate / poll / pagination requests of a cycle.
+_client: Optional[httpx.AsyncClient] = None
+
+async def open_data365_client():
+    """Creates the shared HTTP client used for Data365 requests."""
+    global _client
+    if _client is not None:
+        return
+    logger.info("Opening shared Data365 HTTP client...")
+    _client = httpx.AsyncClient(
+        base_url=_DATA365_BASE_URL,
+        http2=True,
+        timeout=httpx.Timeout(60.0, connect=10.0), # Longer timeout for potential data transfer
+        # Keyword concurrency is bounded by INGESTION_CONCURRENCY; this caps the connections to the Data365 host
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60)
+    )
+
+async def close_data365_client():
+    """Closes the shared Data365 HTTP client."""
+    global _client
+    if _client is not None:
+        logger.info("Closing shared Data365 HTTP client...")
+        await _client.aclose()
+        _client = None
+
+def _get_client() -> httpx.AsyncClient:
+    """Provides access to the shared Data365 HTTP client."""
+    if _client is None:
+        raise Exception("Data365 client not initialized. Call open_data365_client first.")
+    return _client
+
+
+# --- Private Helpers ---
+@lru_cache(maxsize=4096)
+def _quote(term: str) -> str:
+    """URL-encodes a search term; the same term is quoted for initiate, poll and fetch calls."""
+    return urllib.parse.quote(term)
+
+@lru_cache(maxsize=4096)
+def _search_endpoint(search_term: str, search_type: str, resource: str) -> str:
+    """Builds the search endpoint path; resource is 'update' (initiate/status) or 'posts' (results)."""
+    # URL Encode the search term as it's part of the path
+    return f"/facebook/search/{_quote(search_term)}/posts/{search_type}/{resource}"
+
+def _decode_response(response: httpx.Response) -> Dict[str, Any]:
+    """Checks the HTTP status, parses the JSON body and raises on Data365 API errors."""
+    response.raise_for_status() # Check for 4xx/5xx errors
+    response_json = orjson.loads(response.content)
+    logger.debug("Data365 response status: %s (%d bytes)", response.status_code, len(response.content))
+
+    # Basic check for Data365 specific errors in the response body
+    if response_json.get("status") == "fail" or response_json.get("error"):
+        error_info = response_json.get("error", {"code": "Unknown", "message": "No error details provided"})
+        logger.error(f"Data365 API error in response: Code {error_info.get('code')}, Message: {error_info.get('message')}")
+        # Raise a custom exception or return an error indicator if needed
+        raise httpx.HTTPError(f"Data365 API Error: {error_info.get('message')}")
+
+    return response_json
+
+def _log_request_error(endpoint: str, e: Exception):
+    """Logs a failed Data365 call; callers re-raise afterwards."""
+    if isinstance(e, httpx.HTTPStatusError):
+        logger.error(f"HTTP Status Error calling Data365 endpoint {endpoint}: {e.response.status_code} - {e.response.text}")
+    elif isinstance(e, httpx.RequestError):
+        logger.error(f"Network Error calling Data365 endpoint {endpoint}: {e}")
+    else:
+        logger.error(f"Unexpected error during Data365 API call to {endpoint}: {e}")
+
+async def _get_json(endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """GETs a Data365 endpoint (task status, results pages) and returns the parsed body."""
     # Add access token to query parameters for all requests
-    query_params = {"access_token": settings.data365_api_key}
-    if params:
-        query_params.update(params)
-
-    async with httpx.AsyncClient(timeout=60.0) as client: # Longer timeout for potential data transfer
-        try:
-            logger.debug(f"Making Data365 request: {method} {url} PARAMS: {query_params} BODY: {json_data}")
-            response = await client.request(method, url, params=query_params, json=json_data, headers=headers)
-            response.raise_for_status() # Check for 4xx/5xx errors
-            response_json = response.json()
-            logger.debug(f"Data365 response status: {response.status_code}, data: {response_json}")
-
-            # Basic check for Data365 specific errors in the response body
-            if response_json.get("status") == "fail" or response_json.get("error"):
-                error_info = response_json.get("error", {"code": "Unknown", "message": "No error details provided"})
-                logger.error(f"Data365 API error in response: Code {error_info.get('code')}, Message: {error_info.get('message')}")
-                # Raise a custom exception or return an error indicator if needed
-                raise httpx.HTTPError(f"Data365 API Error: {error_info.get('message')}")
-
-            return response_json
-
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP Status Error calling Data365 endpoint {endpoint}: {e.response.status_code} - {e.response.text}")
-            raise  # Re-raise after logging
-        except httpx.RequestError as e:
-            logger.error(f"Network Error calling Data365 endpoint {endpoint}: {e}")
-            raise # Re-raise after logging
-        except Exception as e:
-            logger.error(f"Unexpected error during Data365 API call to {endpoint}: {e}")
-            raise # Re-raise after logging
+    query_params = {**_AUTH_PARAMS, **params} if params else _AUTH_PARAMS
+    logger.debug("Making Data365 request: GET %s PARAMS: %s", endpoint, query_params)
+    try:
+        response = await _get_client().get(endpoint, params=query_params, headers=_HEADERS)
+        return _decode_response(response)
+    except Exception as e:
+        _log_request_error(endpoint, e)
+        raise # Re-raise after logging
+
+async def _post_initiate(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """POSTs to a Data365 update endpoint to initiate a task and returns the parsed body."""
+    query_params = {**_AUTH_PARAMS, **params}
+    logger.debug("Making Data365 request: POST %s PARAMS: %s", endpoint, query_params)
+    try:
+        response = await _get_client().post(endpoint, params=query_params, headers=_HEADERS)
+        return _decode_response(response)
+    except Exception as e:
+        _log_request_error(endpoint, e)
+        raise # Re-raise after logging
 
 
 # --- Public API Functions ---
@@ -74,9 +139,7 @@ async def initiate_facebook_post_search_task(
     Returns:
         The task_id if successful, None otherwise.
     """
-    # URL Encode the search term as it's part of the path
-    encoded_search_term = urllib.parse.quote(search_term)
-    endpoint = f"/facebook/search/{encoded_search_term}/posts/{search_type}/update"
+    endpoint = _search_endpoint(search_term, search_type, "update")
 
     params = {
         "max_posts": max_posts,
@@ -91,7 +154,7 @@ async def initiate_facebook_post_search_task(
 
     logger.info(f"Initiating Data365 search task for term: '{search_term}' (type: {search_type}) with settings: max_posts={max_posts}, load_comments={load_comments}, max_comments={max_comments}")
     try:
-        response_data = await _make_data365_request("POST", endpoint, params=params)
+        response_data = await _post_initiate(endpoint, params)
         task_id = response_data.get("data", {}).get("task_id")
         if task_id:
             logger.info(f"Data365 task initiated successfully for '{search_term}'. Task ID: {task_id}")
@@ -116,17 +179,16 @@ async def get_facebook_search_task_status(search_term: str, search_type: str) ->
         The status string ('created', 'pending', 'finished', 'fail', 'canceled', 'unknown')
         or None if the status check fails.
     """
-    encoded_search_term = urllib.parse.quote(search_term)
-    endpoint = f"/facebook/search/{encoded_search_term}/posts/{search_type}/update"
+    endpoint = _search_endpoint(search_term, search_type, "update")
     # Note: According to docs, GET status uses the SAME update endpoint & identifying path params
     # Query params like max_posts etc. are NOT needed for GET status/data, only the path identifiers.
 
-    logger.debug(f"Checking Data365 task status for term: '{search_term}' (type: {search_type})")
+    logger.debug("Checking Data365 task status for term: '%s' (type: %s)", search_term, search_type)
     try:
-        response_data = await _make_data365_request("GET", endpoint)
+        response_data = await _get_json(endpoint)
         status = response_data.get("data", {}).get("status")
         if status:
-            logger.debug(f"Data365 task status for '{search_term}' is: {status}")
+            logger.debug("Data365 task status for '%s' is: %s", search_term, status)
             return status
         else:
             logger.warning(f"Could not determine task status for '{search_term}' from response: {response_data}")
@@ -156,23 +218,25 @@ async def fetch_facebook_search_results(
         - A list of post dictionaries fetched from this page.
         - The cursor for the next page, or None if this is the last page or an error occurred.
     """
-    encoded_search_term = urllib.parse.quote(search_term)
-    endpoint = f"/facebook/search/{encoded_search_term}/posts/{search_type}/posts"
+    endpoint = _search_endpoint(search_term, search_type, "posts")
 
     params = {"max_page_size": max_page_size}
     if cursor:
         params["cursor"] = cursor
 
-    logger.debug(f"Fetching Data365 results page for '{search_term}' (cursor: {cursor})")
+    logger.debug("Fetching Data365 results page for '%s' (cursor: %s)", search_term, cursor)
     try:
-        response_data = await _make_data365_request("GET", endpoint, params=params)
+        response_data = await _get_json(endpoint, params=params)
 
-        items = response_data.get("data", {}).get("items", [])
+        # Items are kept as the raw dicts orjson produced: they are stored as-is in
+        # original_post_data, so decoding them into a typed subset would lose data.
+        page_data = response_data.get("data", {})
+        items = page_data.get("items", [])
         # Adjust based on actual API response for pagination cursor if needed
-        next_cursor = response_data.get("data", {}).get("page_info", {}).get("next_cursor")
+        next_cursor = page_data.get("page_info", {}).get("next_cursor")
         # Some APIs use 'cursor' or other names in page_info
 
-        logger.debug(f"Fetched {len(items)} items for '{search_term}'. Next cursor: {next_cursor}")
+        logger.debug("Fetched %d items for '%s'. Next cursor: %s", len(items), search_term, next_cursor)
         return items, next_cursor
 
     except Exception as e:
@@ -180,62 +244,95 @@ async def fetch_facebook_search_results(
         return [], None # Return empty list and no cursor on error
 
 
-async def poll_and_fetch_all_results(search_term: str, task_id: str) -> List[Dict[str, Any]]:
+def _poll_delay(attempt: int) -> float:
+    """Jittered exponential backoff between task status checks, capped at the configured poll interval."""
+    backoff = min(settings.data365_poll_interval_seconds, _POLL_BACKOFF_BASE_SECONDS * _POLL_BACKOFF_FACTOR ** attempt)
+    return backoff + random.uniform(0, _POLL_JITTER_SECONDS)
+
+
+async def stream_all_results(search_term: str, task_id: str) -> AsyncIterator[List[Dict[str, Any]]]:
     """
-    Polls for task completion and fetches all paginated results.
+    Polls for task completion and yields the paginated results page by page.
 
     Args:
         search_term: The original search term.
         task_id: The ID of the task initiated (mostly for logging here).
 
-    Returns:
-        A list containing all fetched post dictionaries for the search term.
+    Yields:
+        Non-empty lists of post dictionaries, one per results page. Nothing is
+        yielded if the task fails, is canceled, or polling times out.
     """
-    all_posts = []
     search_type = settings.data365_search_type # Use configured search type
 
     logger.info(f"Polling task status for '{search_term}' (Task ID: {task_id})")
-    for attempt in range(settings.data365_max_poll_attempts):
+    # Stagger the first status check so concurrent keyword tasks don't hit the API together
+    await asyncio.sleep(random.uniform(0, _POLL_INITIAL_JITTER_SECONDS))
+    # The backoff only changes how often the status is checked; the total polling time stays
+    # what fixed-interval polling allowed (max attempts x poll interval)
+    poll_budget_seconds = settings.data365_max_poll_attempts * settings.data365_poll_interval_seconds
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + poll_budget_seconds
+    attempt = 0
+    while True:
+        attempt += 1
         status = await get_facebook_search_task_status(search_term, search_type)
+        # Sleeps stop at the deadline, so the last check happens right on it
+        remaining = deadline - loop.time()
 
         if status == "finished":
             logger.info(f"Task for '{search_term}' finished. Fetching results...")
-            current_cursor = None
+            total_fetched = 0
             page_num = 1
-            while True:
-                logger.info(f"Fetching page {page_num} for '{search_term}'...")
-                posts_page, next_cursor = await fetch_facebook_search_results(
-                    search_term, search_type, cursor=current_cursor
-                )
-                if posts_page:
-                    all_posts.extend(posts_page)
-                    logger.info(f"Fetched {len(posts_page)} posts on page {page_num}. Total so far: {len(all_posts)}")
-                else:
-                    # Handle case where fetch fails mid-pagination or returns empty
-                    logger.warning(f"Received empty page or error fetching page {page_num} for '{search_term}'. Stopping pagination.")
-                    break # Stop if a page fetch fails or returns empty unexpectedly
-
-                if next_cursor:
-                    current_cursor = next_cursor
+            logger.info(f"Fetching page {page_num} for '{search_term}'...")
+            # The first page is awaited directly; only prefetches of later pages need a Task
+            page_result = await fetch_facebook_search_results(search_term, search_type)
+            pending_page: Optional[asyncio.Task] = None
+            try:
+                while True:
+                    posts_page, next_cursor = page_result
+                    if not posts_page:
+                        # Handle case where fetch fails mid-pagination or returns empty
+                        logger.warning(f"Received empty page or error fetching page {page_num} for '{search_term}'. Stopping pagination.")
+                        break # Stop if a page fetch fails or returns empty unexpectedly
+
+                    if next_cursor:
+                        # Fire the next page request right away so its network latency
+                        # overlaps with the consumer handling the current page.
+                        pending_page = asyncio.create_task(
+                            fetch_facebook_search_results(search_term, search_type, cursor=next_cursor)
+                        )
+
+                    total_fetched += len(posts_page)
+                    logger.info(f"Fetched {len(posts_page)} posts on page {page_num}. Total so far: {total_fetched}")
+                    yield posts_page
+
+                    if pending_page is None:
+                        logger.info(f"No next cursor found. Finished fetching all pages for '{search_term}'.")
+                        break
                     page_num += 1
-                    await asyncio.sleep(1) # Small delay between page fetches
-                else:
-                    logger.info(f"No next cursor found. Finished fetching all pages for '{search_term}'.")
-                    break # No more pages
-            return all_posts # Return all collected posts
+                    logger.info(f"Fetching page {page_num} for '{search_term}'...")
+                    page_result = await pending_page
+                    pending_page = None
+            finally:
+                # The consumer may stop early (error or cancellation); don't leave a prefetch running
+                if pending_page is not None:
+                    pending_page.cancel()
+            return
 
         elif status in ["fail", "canceled"]:
             logger.error(f"Task for '{search_term}' failed or was canceled (Status: {status}).")
-            return [] # Return empty list
+            return
+
+        elif remaining <= 0:
+            break
 
         elif status in ["created", "pending", "unknown"] or status is None:
-            logger.info(f"Task for '{search_term}' status: {status}. Attempt {attempt + 1}/{settings.data365_max_poll_attempts}. Waiting...")
-            await asyncio.sleep(settings.data365_poll_interval_seconds)
+            logger.info(f"Task for '{search_term}' status: {status}. Attempt {attempt}, {remaining:.0f}s of polling left. Waiting...")
+            await asyncio.sleep(min(_poll_delay(attempt - 1), remaining))
 
         else: # Should not happen with known statuses
              logger.warning(f"Unexpected task status '{status}' for '{search_term}'. Waiting...")
-             await asyncio.sleep(settings.data365_poll_interval_seconds)
+             await asyncio.sleep(min(_poll_delay(attempt - 1), remaining))
 
 
-    logger.error(f"Task polling timed out for '{search_term}' after {settings.data365_max_poll_attempts} attempts.")
-    return [] # Return empty list if polling times out
\ No newline at end of file
+    logger.error(f"Task polling timed out for '{search_term}' after {attempt} attempts ({poll_budget_seconds}s).")
@@ -2,16 +2,20 @@
 
 import logging
 import asyncio
-import json # For file-based cache
+import hashlib # For deterministic document ids
+import time # For cache timestamps
+import os # For atomic cache file replacement
+import msgpack # For file-based cache
+import orjson # For content keys of posts without an id
 from datetime import datetime, timedelta, timezone # For cache TTL and timezone awareness
 from pathlib import Path # For cache file path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Set
 
 from app.core.config import settings
 from app.services.keyword_service import fetch_active_keywords
 from app.services.data365_service import (
     initiate_facebook_post_search_task,
-    poll_and_fetch_all_results,
+    stream_all_results,
 )
 from app.db.crud import insert_raw_facebook_posts
 from app.models.data_models import RawFacebookPost
@@ -26,43 +30,133 @@ logger = logging.getLogger(__name__)
 APP_ROOT_DIR = Path(__file__).resolve().parent.parent # This should point to /app/app
 INGESTER_CACHE_DIR = APP_ROOT_DIR / "cache_data" # Creates /app/app/cache_data
 INGESTER_CACHE_DIR.mkdir(parents=True, exist_ok=True) # Ensure directory exists
-CACHE_FILE_PATH = INGESTER_CACHE_DIR / "social_media_ingester_cache.json"
+CACHE_FILE_PATH = INGESTER_CACHE_DIR / "social_media_ingester_cache.msgpack"
+CACHE_FILE_PATH_STR = str(CACHE_FILE_PATH) # Plain str for the open() calls on the cache path
+CACHE_TMP_FILE_PATH_STR = CACHE_FILE_PATH_STR + ".tmp"
 
 KEYWORD_REPROCESS_INTERVAL = timedelta(hours=settings.keyword_reprocess_hours)
 
-def load_ingester_cache() -> Dict[str, str]: # Stores ISO string timestamps
-    """Loads the ingester cache from a JSON file."""
-    if CACHE_FILE_PATH.exists():
-        try:
-            with open(CACHE_FILE_PATH, "r", encoding="utf-8") as f:
-                cache_content = json.load(f)
-                if isinstance(cache_content, dict):
-                    return cache_content
-                else:
-                    logger.warning(f"Cache file {CACHE_FILE_PATH} content is not a dictionary. Re-initializing cache.")
-                    return {}
-        except (json.JSONDecodeError, IOError) as e:
-            logger.error(f"Error loading ingester cache from {CACHE_FILE_PATH}: {e}. Starting with an empty cache.")
-    return {}
-
-def save_ingester_cache(cache: Dict[str, str]):
-    """Saves the ingester cache to a JSON file."""
+# Location appended to each search term, per keyword language
+_LOCATION_APPEND_MAP: Dict[str, str] = {
+    "en": "Tunisia",
+    "fr": "Tunisie",
+    "ar": "تونس"
+}
+
+# The cache is an append-only log of msgpack-encoded [concept_id, epoch_ts] pairs, one per
+# processed concept_id, later entries overriding earlier ones. It is internal only,
+# so a compact binary encoding is used. The log is compacted on load once superseded
+# entries outnumber live ones.
+
+def load_ingester_cache() -> Dict[str, float]: # Stores epoch timestamps (seconds)
+    """Loads the ingester cache by replaying the msgpack cache log."""
+    cache: Dict[str, float] = {}
+    entry_count = 0
+    needs_rewrite = False
+    now_ts = time.time()
+    try:
+        with open(CACHE_FILE_PATH_STR, "rb") as f:
+            unpacker = msgpack.Unpacker(f, raw=False)
+            read_end = 0 # Offset just past the last complete entry
+            try:
+                for entry in unpacker:
+                    entry_count += 1
+                    read_end = unpacker.tell()
+                    if (isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], str)
+                            and isinstance(entry[1], (int, float)) and entry[1] <= now_ts):
+                        cache[entry[0]] = entry[1]
+                    else:
+                        logger.warning(f"Skipping malformed entry {entry_count} in cache file {CACHE_FILE_PATH_STR}.")
+                        needs_rewrite = True
+                # Stopping short of the end of the file means a torn trailing entry (e.g. crash mid-append)
+                if read_end < os.fstat(f.fileno()).st_size:
+                    logger.warning(f"Ingester cache {CACHE_FILE_PATH_STR} ends with a truncated entry.")
+                    needs_rewrite = True
+            except (msgpack.UnpackException, ValueError) as e:
+                logger.error(f"Corrupt ingester cache {CACHE_FILE_PATH_STR}: {e}. Keeping the {len(cache)} entries read before it.")
+                needs_rewrite = True
+    except FileNotFoundError:
+        return {} # First run, nothing cached yet
+    except OSError as e:
+        logger.error(f"Error loading ingester cache from {CACHE_FILE_PATH_STR}: {e}. Starting with an empty cache.")
+        return {}
+
+    # Entries older than twice the reprocess interval no longer affect any decision;
+    # dropping them keeps the cache bounded to recently processed keywords.
+    expiry_cutoff_ts = now_ts - 2 * KEYWORD_REPROCESS_INTERVAL.total_seconds()
+    cache = {concept_id: ts for concept_id, ts in cache.items() if ts > expiry_cutoff_ts}
+
+    # The msgpack log has no framing to resync on, so anything appended after a torn or
+    # corrupt entry would be misread. Rewrite it from the kept entries before appending again.
+    if needs_rewrite:
+        logger.info(f"Rewriting ingester cache from the {len(cache)} valid entries.")
+        save_ingester_cache(cache)
+    elif len(cache) * 2 < entry_count:
+        logger.info(f"Compacting ingester cache: {entry_count} log entries for {len(cache)} concept ids.")
+        save_ingester_cache(cache)
+    return cache
+
+def append_cache_entry(concept_id: str, ts: float):
+    """Appends a single processed concept_id to the cache log."""
     try:
-        with open(CACHE_FILE_PATH, "w", encoding="utf-8") as f:
-            json.dump(cache, f, indent=2)
-        logger.debug(f"Ingester cache saved to {CACHE_FILE_PATH}")
+        with open(CACHE_FILE_PATH_STR, "ab") as f:
+            f.write(msgpack.packb([concept_id, ts], use_bin_type=True))
     except IOError as e:
-        logger.error(f"Error saving ingester cache to {CACHE_FILE_PATH}: {e}")
+        logger.error(f"Error appending to ingester cache {CACHE_FILE_PATH_STR}: {e}")
+
+def save_ingester_cache(cache: Dict[str, float]):
+    """Rewrites the cache log with one entry per concept_id (compaction)."""
+    # Write to a temp file and atomically swap it in, so a crash mid-write never
+    # leaves a truncated cache behind.
+    try:
+        packer = msgpack.Packer(use_bin_type=True)
+        with open(CACHE_TMP_FILE_PATH_STR, "wb") as f:
+            f.writelines(packer.pack([concept_id, ts]) for concept_id, ts in cache.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(CACHE_TMP_FILE_PATH_STR, CACHE_FILE_PATH_STR)
+        logger.debug("Ingester cache saved to %s", CACHE_FILE_PATH_STR)
+    except OSError as e:
+        logger.error(f"Error saving ingester cache to {CACHE_FILE_PATH_STR}: {e}")
+
+def _build_post_document(
+    post_data: Dict[str, Any],
+    original_term: str,
+    concept_id: str,
+    language: str,
+    task_id: str,
+    ingestion_timestamp: datetime
+) -> RawFacebookPost:
+    """Builds the MongoDB document for one raw Data365 post."""
+    # Deterministic _id (post + keyword + language) makes re-inserting the same results idempotent.
+    # Posts without an id are keyed by their full content so they don't all collapse into one.
+    post_id = post_data.get("id")
+    post_key = str(post_id) if post_id else orjson.dumps(post_data, option=orjson.OPT_SORT_KEYS).decode()
+    doc_key = "\x1f".join((post_key, original_term, language)) # Unit separator keeps the parts unambiguous
+    # Dict literal rather than RawFacebookPost(...): same result without the per-post call overhead
+    return {
+        "_id": hashlib.blake2b(doc_key.encode(), digest_size=16).hexdigest(),
+        "ingestion_timestamp": ingestion_timestamp,
+        "source_api": "Data365/Facebook",
+        "data_type": "post",
+        "retrieved_by_keyword": original_term,
+        "keyword_concept_id": concept_id,
+        "keyword_language": language,
+        "data365_task_id": task_id,
+        "original_post_data": post_data
+    }
 
 async def process_keyword(
     keyword_info: Dict[str, Any],
     language: str,
-    ingester_cache: Dict[str, str] # Pass the cache to be updated
-):
+    ingester_cache: Dict[str, float], # Pass the cache to be updated
+    store_posts: Callable[[List[RawFacebookPost]], Awaitable[Any]] = insert_raw_facebook_posts
+) -> int:
     """
     Processes a single keyword: MODIFIES search term with location,
-    initiates task, polls, fetches, structures, and prepares for DB insert.
-    Returns list of RawFacebookPost or empty list if skipped/failed.
+    initiates task, polls, and passes each fetched page of results to store_posts
+    (a direct DB insert by default, the DB writer queue during a cycle).
+    Returns the number of posts handed to store_posts, or 0 if skipped/failed.
     Updates ingester_cache if an external API call is made.
     """
     original_term = keyword_info.get("term")
@@ -73,15 +167,10 @@ async def process_keyword(
 
     if not original_term or not concept_id: # Should not happen if selected properly
         logger.warning(f"process_keyword called with missing term or concept_id: {keyword_info}")
-        return []
+        return 0
 
     # --- START MODIFICATION: Append Location (existing logic) ---
-    location_append_map = {
-        "en": "Tunisia",
-        "fr": "Tunisie",
-        "ar": "تونس"
-    }
-    location_specifier = location_append_map.get(language)
+    location_specifier = _LOCATION_APPEND_MAP.get(language)
     modified_search_term = original_term
     if location_specifier:
         modified_search_term = f"{original_term} {location_specifier}"
@@ -93,59 +182,62 @@ async def process_keyword(
 
     if not task_id:
         logger.error(f"Failed to initiate Data365 search task for modified keyword: '{modified_search_term}'. Skipping.")
-        return []
+        return 0
 
     # --- Update Cache ON SUCCESSFUL TASK INITIATION ---
     now_utc = datetime.now(timezone.utc)
-    ingester_cache[concept_id] = now_utc.isoformat().replace("+00:00", "Z")
-    # The cache will be saved in bulk at the end of run_ingestion_cycle
-
-    raw_posts_data = await poll_and_fetch_all_results(search_term=modified_search_term, task_id=task_id)
-
-    if not raw_posts_data:
+    processed_at = now_utc.timestamp()
+    ingester_cache[concept_id] = processed_at
+    append_cache_entry(concept_id, processed_at)
+
+    # All posts of a keyword share the same (timezone-aware) ingestion timestamp
+    stored_count = 0
+    # Hand over page by page so only one page of posts is held in memory per keyword
+    async for posts_page in stream_all_results(search_term=modified_search_term, task_id=task_id):
+        await store_posts([
+            _build_post_document(post_data, original_term, concept_id, language, task_id, now_utc)
+            for post_data in posts_page
+        ])
+        stored_count += len(posts_page)
+
+    if not stored_count:
         logger.info(f"No posts found or fetched for original keyword: '{original_term}' (searched as: '{modified_search_term}').")
-        return []
-
-    posts_to_insert = []
-    for post_data in raw_posts_data:
-        try:
-            structured_post = RawFacebookPost(
-                retrieved_by_keyword=original_term,
-                keyword_concept_id=concept_id,
-                keyword_language=language,
-                data365_task_id=task_id,
-                original_post_data=post_data
-            )
-            posts_to_insert.append(structured_post)
-        except Exception as e:
-            logger.error(f"Error structuring post data for original keyword '{original_term}': {e}. Data: {post_data}")
+    else:
+        logger.info(f"Fetched {stored_count} posts for original keyword: '{original_term}'.")
+    return stored_count
 
-    logger.info(f"Prepared {len(posts_to_insert)} posts for insertion for original keyword: '{original_term}'.")
-    return posts_to_insert
 
+# --- Ingestion Pipeline ---
+# A cycle runs three stages connected by bounded queues, so Data365 polling and DB
+# writes overlap and a slow stage applies backpressure to the one before it:
+#   keyword producer -> keyword_queue -> Data365 workers -> post_queue -> DB writer
+# None is used as the stop sentinel on both queues.
 
-async def run_ingestion_cycle():
-    """Runs a full ingestion cycle: loads cache, fetches keywords, processes them (respecting cache and limits), and saves cache."""
-    logger.info(f"Starting new ingestion cycle... Reprocess interval: {KEYWORD_REPROCESS_INTERVAL}")
-    current_ingester_cache = load_ingester_cache()
-    all_posts_for_cycle: List[RawFacebookPost] = []
-    
-    # List to store items that need actual external processing
-    # Each item: {'kw_info': Dict[str, Any], 'language': str}
-    items_for_external_processing: List[Dict[str, Any]] = []
+async def _keyword_producer(
+    keyword_queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    ingester_cache: Dict[str, float],
+    worker_count: int
+):
+    """Fetches candidate keywords, filters them via the cache and the per-cycle budget, and queues them."""
     external_api_calls_to_make_count = 0
-
-    for lang in settings.target_languages:
+    # A concept can have terms in several languages; process it once per cycle
+    seen_concept_ids: Set[str] = set()
+    # Keywords processed after this point are still fresh; computed once for the whole cycle
+    reprocess_cutoff_ts = time.time() - KEYWORD_REPROCESS_INTERVAL.total_seconds()
+
+    # Fetch more candidates than keywords_per_cycle to account for cache skips.
+    candidate_limit = max(settings.keywords_per_cycle * 3, 15) # Fetch at least 15 or 3x target
+    logger.info(f"Fetching candidate keywords for languages: {settings.target_languages}")
+    # Fetch all languages concurrently; the per-cycle budget is applied below in language order
+    candidate_lists = await asyncio.gather(*[
+        fetch_active_keywords(language=lang, limit=candidate_limit) for lang in settings.target_languages
+    ])
+
+    for lang, candidate_keywords in zip(settings.target_languages, candidate_lists):
         if external_api_calls_to_make_count >= settings.keywords_per_cycle:
             logger.info(f"Target for external API calls ({settings.keywords_per_cycle}) reached for this cycle. Skipping further languages.")
             break
 
-        logger.info(f"Fetching candidate keywords for language: {lang}")
-        # Fetch more candidates than keywords_per_cycle to account for cache skips.
-        candidate_limit = max(settings.keywords_per_cycle * 3, 15) # Fetch at least 15 or 3x target
-        
-        candidate_keywords = await fetch_active_keywords(language=lang, limit=candidate_limit)
-
         if not candidate_keywords:
             logger.info(f"No candidate keywords fetched for language: {lang}. Skipping.")
             continue
@@ -154,67 +246,139 @@ async def run_ingestion_cycle():
         
         for kw_info in candidate_keywords:
             if external_api_calls_to_make_count >= settings.keywords_per_cycle:
-                logger.debug(f"Target for external API calls ({settings.keywords_per_cycle}) reached within language {lang}. Not considering more candidates.")
+                logger.debug("Target for external API calls (%d) reached within language %s. Not considering more candidates.", settings.keywords_per_cycle, lang)
                 break # Stop considering more candidates for this language
 
             concept_id = kw_info.get("concept_id")
+            term = kw_info.get("term")
             if not concept_id:
                 logger.warning(f"Skipping candidate kw_info due to missing concept_id: {kw_info}")
                 continue
+            if concept_id in seen_concept_ids:
+                logger.debug("Concept ID '%s' (Term: '%s') already considered this cycle. Skipping.", concept_id, term)
+                continue
+            seen_concept_ids.add(concept_id)
 
             # Check cache for this candidate
-            now_utc = datetime.now(timezone.utc)
-            last_processed_iso = current_ingester_cache.get(concept_id)
+            last_processed_ts = ingester_cache.get(concept_id)
             should_process_externally = True # Assume we will process unless cache says no
 
-            if last_processed_iso:
-                try:
-                    last_processed_dt = datetime.fromisoformat(last_processed_iso.replace("Z", "+00:00")).astimezone(timezone.utc)
-                    if (now_utc - last_processed_dt) < KEYWORD_REPROCESS_INTERVAL:
-                        should_process_externally = False 
-                        logger.debug(f"CACHE HIT: Concept ID '{concept_id}' (Term: '{kw_info.get('term')}') processed at {last_processed_dt}. Will not initiate external API call.")
-                    else:
-                        logger.debug(f"CACHE STALE: Concept ID '{concept_id}' (Term: '{kw_info.get('term')}') last processed at {last_processed_dt}. Will be considered for reprocessing.")
-                except ValueError:
-                    logger.warning(f"Invalid cache timestamp for {concept_id} ('{last_processed_iso}'). Will be considered for processing.")
+            if last_processed_ts is not None:
+                if last_processed_ts > reprocess_cutoff_ts:
+                    should_process_externally = False
+                    logger.debug("CACHE HIT: Concept ID '%s' (Term: '%s') processed at %s. Will not initiate external API call.", concept_id, term, last_processed_ts)
+                else:
+                    logger.debug("CACHE STALE: Concept ID '%s' (Term: '%s') last processed at %s. Will be considered for reprocessing.", concept_id, term, last_processed_ts)
             else:
-                 logger.debug(f"CACHE MISS: Concept ID '{concept_id}' (Term: '{kw_info.get('term')}') not in cache. Will be considered for processing.")
+                 logger.debug("CACHE MISS: Concept ID '%s' (Term: '%s') not in cache. Will be considered for processing.", concept_id, term)
             
             if should_process_externally:
-                items_for_external_processing.append({'kw_info': kw_info, 'language': lang})
+                await keyword_queue.put({'kw_info': kw_info, 'language': lang})
                 external_api_calls_to_make_count += 1
-                logger.debug(f"Concept ID '{concept_id}' added to external processing list. API calls to make this cycle: {external_api_calls_to_make_count}/{settings.keywords_per_cycle}")
-    
-    # Create tasks only for the selected items
-    processing_tasks = []
-    for item in items_for_external_processing:
-        # process_keyword will update the cache internally if successful
-        processing_tasks.append(
-            asyncio.create_task(process_keyword(item['kw_info'], item['language'], current_ingester_cache))
-        )
-    
-    if not processing_tasks:
+                logger.debug("Concept ID '%s' queued for external processing. API calls to make this cycle: %d/%d", concept_id, external_api_calls_to_make_count, settings.keywords_per_cycle)
+
+    if not external_api_calls_to_make_count:
         logger.info("No keywords to process externally in this cycle after cache checks and limits.")
     else:
-        logger.info(f"Gathering results for {len(processing_tasks)} keyword processing tasks...")
-        results = await asyncio.gather(*processing_tasks, return_exceptions=True)
-
-        for result in results:
-            if isinstance(result, Exception):
-                logger.error(f"An error occurred during a keyword processing task: {result}", exc_info=True)
-            elif isinstance(result, list): 
-                all_posts_for_cycle.extend(result)
-            # process_keyword returns empty list [] on skip or no data
-
-    save_ingester_cache(current_ingester_cache) 
+        logger.info(f"Queued {external_api_calls_to_make_count} keywords for processing (max {worker_count} concurrently).")
+    for _ in range(worker_count):
+        await keyword_queue.put(None)
+
+async def _data365_worker(
+    keyword_queue: "asyncio.Queue[Optional[Dict[str, Any]]]",
+    post_queue: "asyncio.Queue[Optional[List[RawFacebookPost]]]",
+    ingester_cache: Dict[str, float]
+):
+    """Processes queued keywords one at a time, sending result pages to the DB writer."""
+    while True:
+        item = await keyword_queue.get()
+        if item is None:
+            return
+        # Errors are handled per keyword so one failure doesn't stop the worker or cancel the cycle
+        try:
+            # process_keyword will update the cache internally if successful
+            await process_keyword(item['kw_info'], item['language'], ingester_cache, store_posts=post_queue.put)
+        except Exception as e:
+            logger.error(f"An error occurred during a keyword processing task: {e}", exc_info=True)
 
-    if all_posts_for_cycle:
-        logger.info(f"Attempting to insert a total of {len(all_posts_for_cycle)} posts for this cycle.")
+async def _db_writer(post_queue: "asyncio.Queue[Optional[List[RawFacebookPost]]]") -> int:
+    """
+    Inserts queued post pages in batches of up to INGESTION_WRITE_BATCH_SIZE posts, flushing
+    partial batches after INGESTION_WRITE_FLUSH_SECONDS. Returns the number of posts handed to the DB.
+    """
+    loop = asyncio.get_running_loop()
+    buffer: List[RawFacebookPost] = []
+    flush_at = 0.0
+    stored_total = 0
+
+    async def _flush():
+        nonlocal buffer, stored_total
+        if not buffer:
+            return
+        batch, buffer = buffer, []
         try:
-            await insert_raw_facebook_posts(all_posts_for_cycle)
+            await insert_raw_facebook_posts(batch)
+            stored_total += len(batch)
+            logger.info(f"Running total of posts stored this cycle: {stored_total}")
+        except asyncio.CancelledError:
+            # Keep the batch for the flush on cancellation; deterministic _ids make
+            # re-inserting any part that was already written harmless
+            buffer = batch + buffer
+            raise
         except Exception as e:
             logger.error(f"Failed to insert batch of posts into database: {e}")
-    else:
-        logger.info("No posts collected in this cycle to insert into the database.")
 
-    logger.info("Ingestion cycle finished.")
\ No newline at end of file
+    try:
+        while True:
+            timeout = max(0.0, flush_at - loop.time()) if buffer else None
+            try:
+                # asyncio.timeout rather than wait_for: on 3.11 wait_for can swallow an
+                # outer cancellation that races with a completed get()
+                async with asyncio.timeout(timeout):
+                    page = await post_queue.get()
+            except TimeoutError:
+                await _flush()
+                continue
+            if page is None:
+                await _flush()
+                return stored_total
+            if not buffer:
+                flush_at = loop.time() + settings.ingestion_write_flush_seconds
+            buffer.extend(page)
+            if len(buffer) >= settings.ingestion_write_batch_size:
+                await _flush()
+    except asyncio.CancelledError:
+        # The cycle was cancelled (e.g. the TaskGroup is torn down). These keywords are
+        # already marked as processed in the cache, so store what was fetched before exiting,
+        # including pages still waiting in the queue.
+        while not post_queue.empty():
+            page = post_queue.get_nowait()
+            if page is not None:
+                buffer.extend(page)
+        await asyncio.shield(_flush())
+        raise
+
+
+async def run_ingestion_cycle():
+    """Runs a full ingestion cycle: loads cache, fetches keywords, and processes them (respecting cache and limits)."""
+    logger.info(f"Starting new ingestion cycle... Reprocess interval: {KEYWORD_REPROCESS_INTERVAL}")
+    current_ingester_cache = load_ingester_cache()
+
+    # Each Data365 worker holds a long-running poll and a page of fetched posts in memory
+    worker_count = settings.ingestion_concurrency
+    keyword_queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=worker_count)
+    post_queue: "asyncio.Queue[Optional[List[RawFacebookPost]]]" = asyncio.Queue(maxsize=worker_count * 2)
+
+    async def _run_data365_workers():
+        async with asyncio.TaskGroup() as workers:
+            for _ in range(worker_count):
+                workers.create_task(_data365_worker(keyword_queue, post_queue, current_ingester_cache))
+        await post_queue.put(None) # All workers are done; let the writer flush and stop
+
+    async with asyncio.TaskGroup() as tg:
+        tg.create_task(_keyword_producer(keyword_queue, current_ingester_cache, worker_count))
+        tg.create_task(_run_data365_workers())
+        writer = tg.create_task(_db_writer(post_queue))
+    logger.info(f"Stored a total of {writer.result()} posts for this cycle.")
+
+    logger.info("Ingestion cycle finished.")
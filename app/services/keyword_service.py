@@ -1,13 +1,54 @@
 import logging
+import time
 import httpx
-from typing import List, Dict, Any, Optional
+import orjson
+from typing import List, Dict, Any, Optional, Tuple
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+# --- Shared HTTP Client ---
+# Reused across cycles so Keyword Manager calls share pooled keep-alive connections.
+_client: Optional[httpx.AsyncClient] = None
+
+async def open_keyword_client():
+    """Creates the shared HTTP client used for Keyword Manager requests."""
+    global _client
+    if _client is not None:
+        return
+    logger.info("Opening shared Keyword Manager HTTP client...")
+    _client = httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=10)
+    )
+
+async def close_keyword_client():
+    """Closes the shared Keyword Manager HTTP client."""
+    global _client
+    if _client is not None:
+        logger.info("Closing shared Keyword Manager HTTP client...")
+        await _client.aclose()
+        _client = None
+
+def _get_client() -> httpx.AsyncClient:
+    """Provides access to the shared Keyword Manager HTTP client."""
+    if _client is None:
+        raise Exception("Keyword Manager client not initialized. Call open_keyword_client first.")
+    return _client
+
+# --- Response Cache ---
+# Short-lived cache of Keyword Manager responses keyed on (language, limit), so retried or
+# overlapping cycles don't re-hit the service. Empty results (which include fetch failures)
+# expire sooner so an outage isn't cached for long.
+_KEYWORD_CACHE_TTL_SECONDS = 60.0
+_KEYWORD_CACHE_EMPTY_TTL_SECONDS = 10.0
+_keyword_cache: Dict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]] = {}
+
 async def fetch_active_keywords(language: str, limit: int) -> List[Dict[str, Any]]:
     """
     Fetches active keywords for a specific language from the Keyword Manager.
+    Responses are cached briefly per (language, limit).
 
     Args:
         language: The language code ('ar', 'fr', 'en').
@@ -17,6 +58,22 @@ async def fetch_active_keywords(language: str, limit: int) -> List[Dict[str, Any
         A list of keyword dictionaries (e.g., [{'term': '...', 'concept_id': '...'}, ...])
         or an empty list if fetching fails or no keywords are found.
     """
+    cache_key = (language, limit)
+    cached = _keyword_cache.get(cache_key)
+    if cached is not None:
+        fetched_at, cached_keywords = cached
+        ttl = _KEYWORD_CACHE_TTL_SECONDS if cached_keywords else _KEYWORD_CACHE_EMPTY_TTL_SECONDS
+        if time.monotonic() - fetched_at < ttl:
+            logger.info(f"Using cached keywords for language '{language}' ({len(cached_keywords)} keywords).")
+            return cached_keywords
+
+    keywords = await _fetch_active_keywords_uncached(language, limit)
+    _keyword_cache[cache_key] = (time.monotonic(), keywords)
+    return keywords
+
+
+async def _fetch_active_keywords_uncached(language: str, limit: int) -> List[Dict[str, Any]]:
+    """Fetches active keywords from the Keyword Manager, bypassing the response cache."""
     keyword_url = f"{settings.keyword_manager_url}/keywords"
     params = {
         "lang": language,
@@ -25,27 +82,26 @@ async def fetch_active_keywords(language: str, limit: int) -> List[Dict[str, Any
     }
     logger.info(f"Fetching keywords from {keyword_url} with params: {params}")
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            response = await client.get(keyword_url, params=params)
-            response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-
-            keywords_data = response.json()
-            if isinstance(keywords_data, list):
-                logger.info(f"Successfully fetched {len(keywords_data)} keywords for language '{language}'.")
-                # Make sure the response format matches what process_keyword expects
-                # Example expected item: {"term": "some term", "concept_id": "mongo_id_string", ...}
-                return keywords_data
-            else:
-                logger.warning(f"Received non-list response from Keyword Manager: {keywords_data}")
-                return []
-
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error fetching keywords: {e.response.status_code} - {e.response.text}")
-            return []
-        except httpx.RequestError as e:
-            logger.error(f"Network error fetching keywords: {e}")
+    try:
+        response = await _get_client().get(keyword_url, params=params)
+        response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
+
+        keywords_data = orjson.loads(response.content)
+        if isinstance(keywords_data, list):
+            logger.info(f"Successfully fetched {len(keywords_data)} keywords for language '{language}'.")
+            # Make sure the response format matches what process_keyword expects
+            # Example expected item: {"term": "some term", "concept_id": "mongo_id_string", ...}
+            return keywords_data
+        else:
+            logger.warning(f"Received non-list response from Keyword Manager: {keywords_data}")
             return []
-        except Exception as e:
-            logger.error(f"Unexpected error fetching keywords: {e}")
-            return []
\ No newline at end of file
+
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error fetching keywords: {e.response.status_code} - {e.response.text}")
+        return []
+    except httpx.RequestError as e:
+        logger.error(f"Network error fetching keywords: {e}")
+        return []
+    except Exception as e:
+        logger.error(f"Unexpected error fetching keywords: {e}")
+        return []
\ No newline at end of file
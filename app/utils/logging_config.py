@@ -4,6 +4,10 @@ from app.core.config import settings
 
 def setup_logging():
     log_level = settings.log_level.upper()
+    # The format below doesn't use thread/process info, so skip collecting it on every record
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
     logging.basicConfig(
         level=log_level,
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",